@@ -7,18 +7,28 @@ Telegram Bot - 完整版
 import os
 import sys
 import logging
+import time
 import asyncio
+import hashlib
 import httpx
-from datetime import datetime
-from typing import Optional
+import orjson
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
-
-# 設定日誌
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import (
+    Application,
+    ApplicationHandlerStop,
+    CommandHandler,
+    MessageHandler,
+    TypeHandler,
+    ContextTypes,
+    filters,
 )
+from telegram.request import HTTPXRequest
+
 logger = logging.getLogger(__name__)
 
 # 環境變數
@@ -27,62 +37,306 @@ CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 NEBULA_API_KEY = os.getenv("NEBULA_API_KEY", "")  # 選用
 NEBULA_API_URL = os.getenv("NEBULA_API_URL", "https://api.nebula.gg")
 
-# 驗證環境變數
-if not BOT_TOKEN:
-    logger.error("❌ 錯誤: 未設定 TELEGRAM_BOT_TOKEN")
-    sys.exit(1)
 
-if not CHAT_ID:
-    logger.error("❌ 錯誤: 未設定 TELEGRAM_CHAT_ID")
-    sys.exit(1)
+def validate_env() -> int:
+    """
+    驗證環境變數，缺少必要設定時結束程式
+    
+    Returns:
+        授權使用者的 chat id
+    """
+    if not BOT_TOKEN:
+        logger.error("❌ 錯誤: 未設定 TELEGRAM_BOT_TOKEN")
+        sys.exit(1)
+    
+    if not CHAT_ID:
+        logger.error("❌ 錯誤: 未設定 TELEGRAM_CHAT_ID")
+        sys.exit(1)
+    
+    try:
+        return int(CHAT_ID)
+    except ValueError:
+        logger.error(f"❌ 錯誤: TELEGRAM_CHAT_ID 必須是數字 ({CHAT_ID})")
+        sys.exit(1)
+
+
+# HTTP 客戶端（明確設定連線池，重用 keep-alive 連線並啟用 HTTP/2）
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60.0
+)
+HTTP_HEADERS = {"User-Agent": "alice-bot/1.0"}
+
+# Nebula 請求的路徑與標頭固定不變，直接設定在專用客戶端上
+NEBULA_CHAT_PATH = "/v1/chat/completions"
+NEBULA_HEADERS = {
+    **HTTP_HEADERS,
+    "Authorization": f"Bearer {NEBULA_API_KEY}",
+    "Content-Type": "application/json"
+}
+
+# 限制同時進行的外部請求數量，避免突發流量耗盡連線池
+NEBULA_SEM = asyncio.Semaphore(4)
+YAHOO_SEM = asyncio.Semaphore(8)
+
+# 於 Bot 啟動時建立，import 本模組不會開啟連線池
+http_client: Optional[httpx.AsyncClient] = None
+nebula_client: Optional[httpx.AsyncClient] = None
+
+
+async def open_http_clients(application: Application) -> None:
+    """Bot 啟動時建立 HTTP 連線池"""
+    global http_client, nebula_client
+    
+    http_client = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        limits=HTTP_LIMITS,
+        http2=True,
+        headers=HTTP_HEADERS
+    )
+    
+    # Nebula 專用客戶端，避免連線池被 Yahoo 查詢佔滿
+    nebula_client = httpx.AsyncClient(
+        base_url=NEBULA_API_URL,
+        timeout=HTTP_TIMEOUT,
+        limits=HTTP_LIMITS,
+        http2=True,
+        headers=NEBULA_HEADERS
+    )
+
+
+async def close_http_clients(application: Application) -> None:
+    """Bot 關閉時釋放 HTTP 連線池"""
+    if http_client is not None:
+        await http_client.aclose()
+    if nebula_client is not None:
+        await nebula_client.aclose()
+
+
+# ==================== 時間格式 ====================
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 同一秒內重用已格式化的時間字串
+_now_cache: tuple[int, str] = (0, "")
+
+
+def now_str() -> str:
+    """回傳目前時間字串（精確到秒）"""
+    global _now_cache
+    second = int(time.time())
+    if second != _now_cache[0]:
+        _now_cache = (second, time.strftime(TIME_FORMAT, time.localtime(second)))
+    return _now_cache[1]
 
-logger.info("🤖 Telegram Bot 啟動中...")
-logger.info(f"✅ Bot Token: {BOT_TOKEN[:20]}...")
-logger.info(f"✅ 授權使用者: {CHAT_ID}")
 
-# HTTP 客戶端
-http_client = httpx.AsyncClient(timeout=30.0)
+# ==================== 背景運算 ====================
+
+# CPU 密集的工作（大型報表、Markdown 跳脫等）交給執行緒池，避免阻塞事件迴圈
+# 執行緒在第一次提交工作時才建立
+CPU_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cpu")
+
+
+async def offload(fn: Callable[..., Any], *args: Any) -> Any:
+    """在 CPU_POOL 中執行同步函式並等待結果"""
+    return await asyncio.get_running_loop().run_in_executor(CPU_POOL, fn, *args)
+
+
+# ==================== 快取工具 ====================
+
+class AsyncTTLCache:
+    """
+    具有 TTL 與容量上限的 LRU 快取
+
+    相同 key 的並行請求會共用同一個進行中的 Task，避免重複呼叫外部 API。
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """取得未過期的快取值，不存在則回傳 None"""
+        hit = self._data.get(key)
+        if hit is None:
+            return None
+        if time.monotonic() >= hit[0]:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return hit[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """寫入快取（ttl 未指定時使用預設值），超過容量時淘汰最舊的項目"""
+        expiry = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expiry, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl_for: Optional[Callable[[Any], float]] = None
+    ) -> Any:
+        """
+        取得快取值，未命中時呼叫 fetch 並寫入快取
+
+        ttl_for 可依取得的值決定該筆快取的 TTL；fetch 拋出例外時不會寫入快取。
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetch, ttl_for))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl_for: Optional[Callable[[Any], float]]
+    ) -> Any:
+        value = await fetch()
+        self.set(key, value, ttl_for(value) if ttl_for is not None else None)
+        return value
 
 
 # ==================== Nebula API 整合 ====================
 
-async def call_nebula_api(message: str) -> str:
+NEBULA_KEY_MISSING_MSG = "⚠️ 尚未設定 Nebula API Key，無法使用 AI 對話功能。\n\n請在 Render 環境變數中設定 NEBULA_API_KEY。"
+
+# 串流回應時更新訊息的最短間隔（Telegram 建議每個聊天室每秒最多 1 則）
+NEBULA_PARTIAL_INTERVAL = 1.0
+
+# AI 回應快取（512 筆，10 分鐘）
+nebula_cache = AsyncTTLCache(maxsize=512, ttl=600.0)
+
+
+def _nebula_cache_key(message: str) -> str:
+    """以正規化後的訊息內容產生快取 key"""
+    normalized = message.strip().lower().encode()
+    return hashlib.blake2b(normalized, digest_size=16).hexdigest()
+
+
+async def _request_nebula(
+    message: str,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+) -> str:
+    """
+    以串流 (SSE) 方式向 Nebula API 發送對話請求
+    
+    伺服器未使用串流時改以一般 JSON 回應解析。非 200 回應會拋出 HTTPStatusError，
+    錯誤事件或沒有任何內容時拋出 ValueError，因此不會寫入快取。
+    
+    Args:
+        message: 使用者訊息
+        on_partial: 收到部分回應時呼叫，最多每 NEBULA_PARTIAL_INTERVAL 秒一次
+        
+    Returns:
+        完整 AI 回應內容
+    """
+    chunks: list[str] = []
+    last_partial = time.monotonic()
+    
+    async with NEBULA_SEM, nebula_client.stream(
+        "POST",
+        NEBULA_CHAT_PATH,
+        content=orjson.dumps({
+            "messages": [
+                {
+                    "role": "user",
+                    "content": message
+                }
+            ],
+            "stream": True
+        })
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+        
+        # 伺服器忽略 stream 參數時，直接解析完整回應
+        if not response.headers.get("content-type", "").startswith("text/event-stream"):
+            data = orjson.loads(await response.aread())
+            choices = data.get("choices")
+            content = choices[0].get("message", {}).get("content") if choices else None
+            if not content or not content.strip():
+                raise ValueError(f"Nebula 回應中沒有內容: {data.get('error', data)}")
+            return content
+        
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            
+            chunk = orjson.loads(payload)
+            if "error" in chunk:
+                raise ValueError(f"Nebula 串流錯誤: {chunk['error']}")
+            
+            choices = chunk.get("choices")
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if not delta:
+                continue
+            chunks.append(delta)
+            
+            now = time.monotonic()
+            if on_partial is not None and now - last_partial >= NEBULA_PARTIAL_INTERVAL:
+                last_partial = now
+                await on_partial("".join(chunks))
+    
+    content = "".join(chunks)
+    if not content.strip():
+        raise ValueError("Nebula 串流中沒有任何內容")
+    return content
+
+
+def peek_nebula_reply(message: str) -> Optional[str]:
+    """不發出請求即可取得的回覆（快取命中或未設定 API Key），否則回傳 None"""
+    if not NEBULA_API_KEY:
+        return NEBULA_KEY_MISSING_MSG
+    return nebula_cache.get(_nebula_cache_key(message))
+
+
+async def call_nebula_api(
+    message: str,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+) -> str:
     """
     呼叫 Nebula API 進行 AI 對話
     
     Args:
         message: 使用者訊息
+        on_partial: 串流過程中收到部分回應時呼叫（選用）；
+            若相同訊息已有進行中的請求，則只會等待其完整結果
         
     Returns:
         AI 回應內容
     """
     if not NEBULA_API_KEY:
-        return "⚠️ 尚未設定 Nebula API Key，無法使用 AI 對話功能。\n\n請在 Render 環境變數中設定 NEBULA_API_KEY。"
+        return NEBULA_KEY_MISSING_MSG
     
     try:
-        response = await http_client.post(
-            f"{NEBULA_API_URL}/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {NEBULA_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": message
-                    }
-                ],
-                "stream": False
-            }
+        return await nebula_cache.get_or_fetch(
+            _nebula_cache_key(message),
+            lambda: _request_nebula(message, on_partial)
         )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("choices", [{}])[0].get("message", {}).get("content", "無法取得回應")
-        else:
-            logger.error(f"Nebula API 錯誤: {response.status_code} - {response.text}")
-            return f"❌ API 呼叫失敗 (HTTP {response.status_code})"
+    
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Nebula API 錯誤: {e.response.status_code} - {e.response.text}")
+        return f"❌ API 呼叫失敗 (HTTP {e.response.status_code})"
             
     except Exception as e:
         logger.error(f"Nebula API 異常: {e}")
@@ -91,6 +345,91 @@ async def call_nebula_api(message: str) -> str:
 
 # ==================== 股價查詢功能 ====================
 
+# 股價快取：交易時段內 30 秒，收盤後 5 分鐘
+STOCK_CACHE_TTL = 30.0
+STOCK_CACHE_TTL_CLOSED = 300.0
+
+stock_cache = AsyncTTLCache(maxsize=256, ttl=STOCK_CACHE_TTL_CLOSED)
+
+
+def _stock_cache_ttl(meta: dict) -> float:
+    """依照交易時段決定快取時間"""
+    regular = meta.get("currentTradingPeriod", {}).get("regular", {})
+    start, end = regular.get("start"), regular.get("end")
+    if start and end and start <= time.time() < end:
+        return STOCK_CACHE_TTL
+    return STOCK_CACHE_TTL_CLOSED
+
+
+async def _fetch_stock_meta(stock_code: str) -> dict:
+    """向 Yahoo Finance 取得股票 meta 資料"""
+    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{stock_code}"
+    async with YAHOO_SEM:
+        response = await http_client.get(url)
+    response.raise_for_status()
+
+    data = orjson.loads(response.content)
+    return data["chart"]["result"][0]["meta"]
+
+
+def peek_stock_meta(stock_code: str) -> Optional[dict]:
+    """只查快取、不發出請求；未命中或已過期回傳 None"""
+    return stock_cache.get(stock_code)
+
+
+async def get_stock_meta(stock_code: str) -> dict:
+    """
+    取得股票 meta 資料（含快取）
+
+    同一代碼的並行查詢會共用同一個請求，避免重複呼叫 Yahoo。
+    """
+    return await stock_cache.get_or_fetch(
+        stock_code,
+        lambda: _fetch_stock_meta(stock_code),
+        ttl_for=_stock_cache_ttl
+    )
+
+
+# 單次 /stock 最多查詢的代碼數量
+MAX_STOCK_CODES = 10
+STOCK_SEPARATOR = "\n---\n"
+
+STOCK_PRICE_TEMPLATE = """
+📊 **{symbol}** 即時資訊
+
+💰 目前價格: {price} {currency}
+📉 昨日收盤: {prev_close} {currency}
+{change_emoji} 漲跌: {change:+.2f} ({change_percent:+.2f}%)
+🕐 更新時間: {updated}
+"""
+
+
+def format_stock_price(stock_code: str, meta: dict) -> str:
+    """將股票 meta 資料格式化為回覆訊息"""
+    price = meta.get("regularMarketPrice", "N/A")
+    prev_close = meta.get("previousClose", "N/A")
+    
+    change = change_percent = 0
+    if isinstance(price, (int, float)) and isinstance(prev_close, (int, float)):
+        change = price - prev_close
+        if prev_close != 0:
+            change_percent = change / prev_close * 100
+    
+    # 格式化輸出
+    change_emoji = "🔴" if change < 0 else "🟢" if change > 0 else "⚪"
+    
+    return STOCK_PRICE_TEMPLATE.format(
+        symbol=meta.get("symbol", stock_code),
+        price=price,
+        prev_close=prev_close,
+        currency=meta.get("currency", "TWD"),
+        change_emoji=change_emoji,
+        change=change,
+        change_percent=change_percent,
+        updated=now_str()
+    )
+
+
 async def get_stock_price(stock_code: str) -> str:
     """
     查詢股票即時價格
@@ -103,53 +442,23 @@ async def get_stock_price(stock_code: str) -> str:
     """
     try:
         # 使用 Yahoo Finance API
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{stock_code}"
-        response = await http_client.get(url)
-        
-        if response.status_code == 200:
-            data = response.json()
-            result = data.get("chart", {}).get("result", [{}])[0]
-            meta = result.get("meta", {})
-            
-            price = meta.get("regularMarketPrice", "N/A")
-            prev_close = meta.get("previousClose", "N/A")
-            change = price - prev_close if price != "N/A" and prev_close != "N/A" else 0
-            change_percent = (change / prev_close * 100) if prev_close != "N/A" and prev_close != 0 else 0
-            
-            symbol = meta.get("symbol", stock_code)
-            currency = meta.get("currency", "TWD")
-            
-            # 格式化輸出
-            change_emoji = "🔴" if change < 0 else "🟢" if change > 0 else "⚪"
-            
-            return f"""
-📊 **{symbol}** 即時資訊
-
-💰 目前價格: {price} {currency}
-📉 昨日收盤: {prev_close} {currency}
-{change_emoji} 漲跌: {change:+.2f} ({change_percent:+.2f}%)
-🕐 更新時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-"""
-        else:
-            return f"❌ 無法取得 {stock_code} 的股價資訊（HTTP {response.status_code}）"
+        meta = await get_stock_meta(stock_code)
+        return format_stock_price(stock_code, meta)
+    
+    except httpx.HTTPStatusError as e:
+        return f"❌ 無法取得 {stock_code} 的股價資訊（HTTP {e.response.status_code}）"
+    
+    except (KeyError, IndexError, TypeError):
+        return f"❌ 無法取得 {stock_code} 的股價資訊（回應格式不符）"
             
     except Exception as e:
         logger.error(f"股價查詢錯誤: {e}")
         return f"❌ 查詢失敗: {str(e)}"
 
 
-# ==================== 指令處理器 ====================
+# ==================== 回覆訊息範本 ====================
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """處理 /start 指令"""
-    user_id = str(update.effective_user.id)
-    
-    # 權限檢查
-    if user_id != CHAT_ID:
-        await update.message.reply_text("❌ 抱歉，你沒有使用此 Bot 的權限。")
-        return
-    
-    welcome_message = """
+WELCOME_MESSAGE = """
 👋 歡迎使用 Alice AI 助理！
 
 🤖 **我能做什麼？**
@@ -174,19 +483,8 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 💡 **提示**: 你可以直接問我任何問題！
 """
-    
-    await update.message.reply_text(welcome_message)
-
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """處理 /help 指令"""
-    user_id = str(update.effective_user.id)
-    
-    if user_id != CHAT_ID:
-        await update.message.reply_text("❌ 抱歉，你沒有使用此 Bot 的權限。")
-        return
-    
-    help_text = """
+HELP_TEXT = """
 📚 **使用說明**
 
 **基本指令**
@@ -195,7 +493,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /ping - 測試 Bot 狀態
 
 **股價查詢**
-/stock <代碼> - 查詢股票即時價格
+/stock <代碼> [代碼...] - 查詢股票即時價格（可一次查詢多檔）
 
 支援的股票代碼格式:
 • 台股: 2330.TW (台積電)
@@ -206,6 +504,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /stock 2330.TW
 /stock AAPL
 /stock ^TWII
+/stock 2330.TW AAPL ^TWII
 
 **AI 對話**
 直接輸入訊息即可與 AI 對話:
@@ -224,125 +523,184 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 有問題嗎？直接問我就對了！😊
 """
-    
-    await update.message.reply_text(help_text)
-
 
-async def ping_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """處理 /ping 指令"""
-    user_id = str(update.effective_user.id)
-    
-    if user_id != CHAT_ID:
-        await update.message.reply_text("❌ 抱歉，你沒有使用此 Bot 的權限。")
-        return
-    
-    uptime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    status_message = f"""
+# /ping 回覆只有時間會變動，其餘部分在啟動時組好
+PING_HEAD = """
 🟢 **Bot 狀態: 正常運行中**
 
-⏰ 當前時間: {uptime}
+⏰ 當前時間: """
+PING_TAIL = f"""
 🤖 服務: Telegram Bot
 🔗 連接: Nebula API {'✅' if NEBULA_API_KEY else '⚠️ 未設定'}
 📡 環境: Render.com Background Worker
 
 ✅ 所有系統正常！
 """
-    
-    await update.message.reply_text(status_message)
+
+PORTFOLIO_TEXT = (
+    "📊 **持股管理功能**\n\n"
+    "⚠️ 此功能正在開發中...\n\n"
+    "未來功能:\n"
+    "• 即時持股損益\n"
+    "• 個股成本分析\n"
+    "• 報酬率統計\n"
+    "• 風險評估\n\n"
+    "敬請期待！"
+)
+
+REPORT_TEXT = (
+    "📨 **自動報告推送時間表**\n\n"
+    "⚠️ 推送功能尚未啟用\n\n"
+    "計畫推送時間:\n"
+    "• 每日 06:30 - 台美財經日報\n"
+    "• 每日 07:00 - 持股損益更新\n"
+    "• 週六 07:00 - 每週投資週報\n\n"
+    "敬請期待！"
+)
+
+
+# ==================== 權限檢查 ====================
+
+# 只接受授權使用者的更新，於 PTB 路由階段即過濾（使用者 id 於 main() 中加入）
+AUTHORIZED_USER = filters.User()
+
+# 授權使用者 id，於 main() 中設定；權限閘道直接比對整數，不產生額外物件
+CHAT_ID_INT: Optional[int] = None
+
+
+def is_authorized(update: Update) -> bool:
+    """檢查更新是否來自授權使用者"""
+    user = update.effective_user
+    return user is not None and user.id == CHAT_ID_INT
+
+
+async def auth_gate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """在所有處理器之前靜默丟棄非授權使用者的更新"""
+    if not is_authorized(update):
+        raise ApplicationHandlerStop
+
+
+# ==================== 指令處理器 ====================
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """處理 /start 指令"""
+    await update.message.reply_text(WELCOME_MESSAGE)
+
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """處理 /help 指令"""
+    await update.message.reply_text(HELP_TEXT)
+
+
+async def ping_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """處理 /ping 指令"""
+    await update.message.reply_text(f"{PING_HEAD}{now_str()}{PING_TAIL}")
 
 
 async def stock_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """處理 /stock 指令"""
-    user_id = str(update.effective_user.id)
-    
-    if user_id != CHAT_ID:
-        await update.message.reply_text("❌ 抱歉，你沒有使用此 Bot 的權限。")
-        return
-    
     # 檢查參數
     if not context.args:
         await update.message.reply_text(
             "❌ 請提供股票代碼\n\n"
-            "使用方式: /stock <代碼>\n"
+            "使用方式: /stock <代碼> [代碼...]\n"
             "範例:\n"
             "  /stock 2330.TW (台積電)\n"
             "  /stock AAPL (蘋果)\n"
-            "  /stock ^TWII (台灣加權指數)"
+            "  /stock ^TWII (台灣加權指數)\n"
+            f"  /stock 2330.TW AAPL ^TWII (一次最多 {MAX_STOCK_CODES} 檔)"
         )
         return
     
-    stock_code = context.args[0].upper()
+    # 去除重複代碼並限制數量，避免一次送出過多請求
+    codes = list(dict.fromkeys(arg.upper() for arg in context.args))[:MAX_STOCK_CODES]
+    
+    # 全部命中快取時直接回覆，省去「查詢中」訊息與 edit 的來回
+    cached = [peek_stock_meta(code) for code in codes]
+    if all(meta is not None for meta in cached):
+        await update.message.reply_text(
+            STOCK_SEPARATOR.join(format_stock_price(code, meta) for code, meta in zip(codes, cached))
+        )
+        return
     
     # 發送「查詢中」訊息
-    status_msg = await update.message.reply_text(f"🔍 正在查詢 {stock_code} 的股價...")
+    status_msg = await update.message.reply_text(f"🔍 正在查詢 {', '.join(codes)} 的股價...")
     
-    # 查詢股價
-    result = await get_stock_price(stock_code)
+    # 並行查詢股價
+    results = await asyncio.gather(*(get_stock_price(code) for code in codes), return_exceptions=True)
     
     # 更新訊息
-    await status_msg.edit_text(result)
+    await status_msg.edit_text(STOCK_SEPARATOR.join(
+        f"❌ 查詢失敗: {result}" if isinstance(result, BaseException) else result
+        for result in results
+    ))
 
 
 async def portfolio_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """處理 /portfolio 指令"""
-    user_id = str(update.effective_user.id)
-    
-    if user_id != CHAT_ID:
-        await update.message.reply_text("❌ 抱歉，你沒有使用此 Bot 的權限。")
-        return
-    
-    await update.message.reply_text(
-        "📊 **持股管理功能**\n\n"
-        "⚠️ 此功能正在開發中...\n\n"
-        "未來功能:\n"
-        "• 即時持股損益\n"
-        "• 個股成本分析\n"
-        "• 報酬率統計\n"
-        "• 風險評估\n\n"
-        "敬請期待！"
-    )
+    await update.message.reply_text(PORTFOLIO_TEXT)
 
 
 async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """處理 /report 指令"""
-    user_id = str(update.effective_user.id)
-    
-    if user_id != CHAT_ID:
-        await update.message.reply_text("❌ 抱歉，你沒有使用此 Bot 的權限。")
-        return
-    
-    await update.message.reply_text(
-        "📨 **自動報告推送時間表**\n\n"
-        "⚠️ 推送功能尚未啟用\n\n"
-        "計畫推送時間:\n"
-        "• 每日 06:30 - 台美財經日報\n"
-        "• 每日 07:00 - 持股損益更新\n"
-        "• 週六 07:00 - 每週投資週報\n\n"
-        "敬請期待！"
-    )
+    await update.message.reply_text(REPORT_TEXT)
+
+
+def split_message(text: str) -> list[str]:
+    """
+    依 Telegram 單則訊息長度上限切分文字
+
+    Telegram 會去除訊息前後的空白，因此每段都先 strip，並捨棄只有空白的段落。
+    """
+    limit = MessageLimit.MAX_TEXT_LENGTH
+    parts = (text[i:i + limit].strip() for i in range(0, len(text), limit))
+    return [part for part in parts if part]
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """處理一般訊息（AI 對話）"""
-    user_id = str(update.effective_user.id)
     message_text = update.message.text
     
-    # 權限檢查
-    if user_id != CHAT_ID:
-        await update.message.reply_text("❌ 抱歉，你沒有使用此 Bot 的權限。")
-        return
+    logger.info(f"收到訊息: {message_text} (用戶: {update.effective_user.id})")
     
-    logger.info(f"收到訊息: {message_text} (用戶: {user_id})")
+    # 不需呼叫 API 時直接回覆
+    cached = peek_nebula_reply(message_text)
+    if cached is not None:
+        for part in split_message(cached):
+            await update.message.reply_text(part)
+        return
     
     # 發送「思考中」訊息
     status_msg = await update.message.reply_text("🤔 正在思考...")
     
-    # 呼叫 Nebula API
-    response = await call_nebula_api(message_text)
+    last_text = status_msg.text
     
-    # 更新訊息
-    await status_msg.edit_text(response)
+    async def show_partial(text: str) -> None:
+        """串流過程中更新「思考中」訊息，失敗時不中斷串流"""
+        nonlocal last_text
+        text = text[:MessageLimit.MAX_TEXT_LENGTH].strip()
+        if not text or text == last_text:
+            return
+        try:
+            await status_msg.edit_text(text)
+            last_text = text
+        except TelegramError as e:
+            logger.warning(f"更新串流訊息失敗: {e}")
+    
+    # 呼叫 Nebula API（串流）
+    response = await call_nebula_api(message_text, on_partial=show_partial)
+    
+    # 更新訊息，超過 Telegram 長度上限的部分另外發送
+    # 與 Telegram 相同先去除前後空白再比較，避免送出內容未變的 edit
+    first, *rest = split_message(response)
+    if first != last_text:
+        try:
+            await status_msg.edit_text(first)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+    for part in rest:
+        await update.message.reply_text(part)
 
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
@@ -358,20 +716,63 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
 
 def main():
     """主程式"""
+    # 設定日誌
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    # 使用 uvloop 事件迴圈（Linux/macOS），未安裝時沿用預設迴圈
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        logger.info("ℹ️ 未安裝 uvloop，使用預設 asyncio 事件迴圈")
+    
+    global CHAT_ID_INT
+    chat_id = validate_env()
+    CHAT_ID_INT = chat_id
+    AUTHORIZED_USER.add_user_ids(chat_id)
+    
+    logger.info("🤖 Telegram Bot 啟動中...")
+    logger.info(f"✅ Bot Token: {BOT_TOKEN[:20]}...")
+    logger.info(f"✅ 授權使用者: {chat_id}")
+    
     try:
+        # Telegram 連線池：送出訊息與 getUpdates 長輪詢分開，避免互相搶連線
+        bot_request = HTTPXRequest(
+            connection_pool_size=32,
+            pool_timeout=10.0,
+            connect_timeout=5.0,
+            read_timeout=30.0,
+            http_version="2"
+        )
+        updates_request = HTTPXRequest(connection_pool_size=4, pool_timeout=10.0)
+        
         # 建立 Application
-        application = Application.builder().token(BOT_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .request(bot_request)
+            .get_updates_request(updates_request)
+            .post_init(open_http_clients)
+            .post_shutdown(close_http_clients)
+            .build()
+        )
+        
+        # 權限閘道：先於其他處理器執行，非授權更新直接丟棄、不回覆
+        application.add_handler(TypeHandler(Update, auth_gate), group=-1)
         
         # 註冊指令處理器
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(CommandHandler("ping", ping_command))
-        application.add_handler(CommandHandler("stock", stock_command))
-        application.add_handler(CommandHandler("portfolio", portfolio_command))
-        application.add_handler(CommandHandler("report", report_command))
+        application.add_handler(CommandHandler("start", start_command, filters=AUTHORIZED_USER))
+        application.add_handler(CommandHandler("help", help_command, filters=AUTHORIZED_USER))
+        application.add_handler(CommandHandler("ping", ping_command, filters=AUTHORIZED_USER))
+        application.add_handler(CommandHandler("stock", stock_command, filters=AUTHORIZED_USER))
+        application.add_handler(CommandHandler("portfolio", portfolio_command, filters=AUTHORIZED_USER))
+        application.add_handler(CommandHandler("report", report_command, filters=AUTHORIZED_USER))
         
         # 註冊訊息處理器（AI 對話）
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & AUTHORIZED_USER, handle_message))
         
         # 註冊錯誤處理器
         application.add_error_handler(error_handler)
@@ -379,7 +780,8 @@ def main():
         logger.info("🚀 Bot 啟動成功！正在監聽訊息...")
         
         # 使用 polling 模式（適合 Background Worker）
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        # 所有處理器都只處理一般訊息，只向 Telegram 訂閱 message 類型的更新
+        application.run_polling(allowed_updates=[Update.MESSAGE])
         
     except Exception as e:
         logger.error(f"❌ Bot 啟動失敗: {e}")